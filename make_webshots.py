@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
+import base64
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
 from dataclasses import dataclass, field
+import fcntl
+import json
 import logging
+from math import sqrt
 from multiprocessing import Pipe, Process
 from multiprocessing.connection import Connection
 from operator import attrgetter
 import os
 from pathlib import Path
-from signal import SIGINT
+from queue import Queue
+from signal import SIGINT, SIGTERM
 import socket
-import statistics
+import tempfile
 import time
 from typing import Callable, ClassVar, List, Optional, Tuple, Union
 from xml.sax.saxutils import escape
@@ -18,6 +25,7 @@ import click
 from click_loglevel import LogLevel
 from dandi.consts import known_instances
 from dandi.dandiapi import DandiAPIClient
+from dandi.exceptions import NotFoundError
 from psutil import NoSuchProcess
 from psutil import Process as PSProcess
 from psutil import wait_procs
@@ -28,16 +36,52 @@ from selenium.common.exceptions import (
     WebDriverException,
 )
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 import yaml
+import zstandard
+
+try:
+    # The libyaml-backed dumper is an order of magnitude faster
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper as YamlDumper
 
 log = logging.getLogger("make_webshots")
 
 # set to True to fetch the logs, not enabled by default
 FETCH_CONSOLE_LOGS = False
 
+# How many times to attempt the pages of a dandiset (with exponential
+# backoff) before giving up on the ones that still error out
+MAX_PAGE_TRIES = 3
+
+# set to True to also dump each page's HTML source, not enabled by default
+FETCH_PAGE_SOURCE = False
+
+# Requests which never affect what ends up in a screenshot but do add to the
+# page load: analytics/telemetry beacons and media.  Fonts are deliberately
+# not listed -- blocking them would change how the screenshots render.
+BLOCKED_URLS = [
+    "*google-analytics*",
+    "*googletagmanager*",
+    "*sentry*",
+    "*.mp4",
+    "*.webm",
+]
+
+# Additionally dropped on pages whose screenshot does not depend on raster
+# images (the edit-metadata form).  SVG stays unblocked: inline icons would
+# leave visible holes.
+IMAGE_BLOCKED_URLS = BLOCKED_URLS + [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+]
+
 
 @dataclass
 class LoadStat:
@@ -46,18 +90,21 @@ class LoadStat:
     time: Union[float, str]
     label: str
     url: Optional[str]
+    ext: str = "png"
+    # Formatted/escaped once at construction (in the worker, even), so
+    # rendering is pure concatenation
+    time_cell: str = field(init=False)
 
-    def get_columns(self) -> Tuple[str, str]:
+    def __post_init__(self) -> None:
         t = self.time if isinstance(self.time, str) else f"{self.time:.2f}"
-        if "\n" in t:
-            header = "t=[See below]"
-        else:
-            header = f"t={escape(t)}"
+        self.time_cell = "t=[See below]" if "\n" in t else f"t={escape(t)}"
+
+    def get_columns(self) -> Tuple[str, str]:
         if self.url is not None:
-            header += f" [{self.label}]({self.url})"
+            header = f"{self.time_cell} [{self.label}]({self.url})"
         else:
-            header += f" {self.label}"
-        cell = f"![](images/{self.dandiset}/{self.page}.png)"
+            header = f"{self.time_cell} {self.label}"
+        cell = f"![](images/{self.dandiset}/{self.page}.{self.ext})"
         return (header, cell)
 
     def has_time(self) -> bool:
@@ -65,59 +112,303 @@ class LoadStat:
 
 
 def render_stats(dandiset: str, stats: List[LoadStat]) -> str:
-    s = f"### {dandiset}\n\n"
     header, row = zip(*map(LoadStat.get_columns, stats))
-    s += "| " + " | ".join(header) + " |\n"
-    s += "| --- " * len(stats) + "|\n"
-    s += "| " + " | ".join(row) + " |\n"
-    s += "\n"
+    parts = [
+        f"### {dandiset}\n\n",
+        "| " + " | ".join(header) + " |\n",
+        "| --- " * len(stats) + "|\n",
+        "| " + " | ".join(row) + " |\n",
+        "\n",
+    ]
     first = True
     for ls in stats:
         if isinstance(ls.time, str) and "\n" in ls.time:
             if first:
-                s += "#### Error Messages\n"
+                parts.append("#### Error Messages\n")
                 first = False
-            s += f"<pre>{escape(ls.time)}</pre>\n"
-    return s
+            parts.append(f"<pre>{escape(ls.time)}</pre>\n")
+    return "".join(parts)
+
+
+def write_file(path: Path, data: bytes) -> None:
+    """
+    Dump ``data`` to ``path`` through a raw fd in one open/write/close,
+    skipping the buffered file object ``Path.write_bytes`` sets up for no
+    benefit on a one-shot write.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+def fast_wait(driver, cond, timeout=30, poll=0.05):
+    """
+    ``WebDriverWait.until`` with a 50 ms poll instead of the 500 ms
+    default, for call sites that cannot use the shared per-driver wait
+    objects (a one-off timeout, or no Webshotter at hand).
+    """
+    return WebDriverWait(driver, timeout, poll_frequency=poll).until(cond)
 
 
 class Webshotter:
-    def __init__(self, gui_url: str, headless: bool, login: bool):
+    def __init__(
+        self,
+        gui_url: str,
+        headless: bool,
+        login: bool,
+        debugger_address: Optional[str] = None,
+        screenshot_format: str = "jpeg",
+        cookie_file: Optional[Path] = None,
+        profile_dir: Optional[Path] = None,
+    ):
         self.gui_url = gui_url
+        # All page URLs share this prefix; build it once per instance
+        self._ds_url_prefix = f"{gui_url}/dandiset/"
         self.headless = headless
         self.do_login = login
+        self.debugger_address = debugger_address
+        self.screenshot_format = screenshot_format
+        self.cookie_file = cookie_file
+        # A shared browser brings its own profile: --user-data-dir never
+        # applies when attaching, so the per-worker profile and its login
+        # sentinel are meaningless there (and touching the sentinel would
+        # fail, as only a launched Chrome creates the directory)
+        self.profile_dir = profile_dir if debugger_address is None else None
+        # Disk writes (screenshots, page-source dumps) go through this pool
+        # so they overlap with the next navigation instead of serializing
+        # with it; drain_io() joins them at dandiset granularity
+        self.io_pool = ThreadPoolExecutor(max_workers=2)
+        self.io_futures = []
         self.set_driver()
 
+    @property
+    def screenshot_suffix(self) -> str:
+        return {"png": ".png", "webp": ".webp"}.get(self.screenshot_format, ".jpg")
+
+    def take_screenshot(self) -> bytes:
+        """Capture the current viewport via CDP and return the encoded image"""
+        params = {
+            "format": self.screenshot_format,
+            "captureBeyondViewport": False,
+            # Capture from the compositor surface directly rather than
+            # forcing a fresh compositing flush
+            "fromSurface": True,
+            # Favor encode speed over a few percent of output size
+            "optimizeForSpeed": True,
+        }
+        if self.screenshot_format != "png":
+            params["quality"] = 80
+        res = self.driver.execute_cdp_cmd("Page.captureScreenshot", params)
+        return base64.b64decode(res["data"])
+
+    def save_screenshot(self, path: Path) -> None:
+        """Capture the current viewport and write it to ``path``
+
+        The capture itself must happen on this thread (the driver is not
+        thread-safe), but the write goes to the IO pool.
+        """
+        data = self.take_screenshot()
+        self.io_futures.append(self.io_pool.submit(write_file, path, data))
+
     def __enter__(self):
         return self
 
     def __exit__(self, _exc_type, _exc_val, _exc_tb):
-        self.driver.quit()
+        if self.debugger_address is not None:
+            # The browser is shared with other workers; just drop our tab
+            try:
+                self.driver.close()
+            except WebDriverException:
+                pass
+        else:
+            self.driver.quit()
+        self.io_pool.shutdown(wait=True)
 
     def set_driver(self):
+        # GitHub is only contacted during the login dance, so once a few
+        # pages have gone by the anti-rate-limit throttling can stop
+        self.pages_since_login = 0
         options = Options()
-        options.add_argument("--no-sandbox")
-        if self.headless:
-            options.add_argument("--headless")
-        options.add_argument("--incognito")
-        # options.add_argument('--disable-gpu')
-        options.add_argument("--window-size=1024,1400")
-        options.add_argument("--disable-dev-shm-usage")
-        # driver.set_page_load_timeout(30)
-        # driver.set_script_timeout(30)
-        # driver.implicitly_wait(10)
-        self.driver = webdriver.Chrome(options=options)
+        # Return from .get() at DOMContentLoaded instead of window.load;
+        # the SPA's real "ready" signal is the progress bar disappearing,
+        # which we wait for explicitly, so there is no point in also
+        # waiting on every image and beacon
+        options.page_load_strategy = "eager"
+        # Detach chromedriver (and thus the Chrome tree it spawns) into its
+        # own process group, so cleanup_children can take the whole tree
+        # down with a single killpg; by default it would share ours
+        service = Service(popen_kw={"start_new_session": True})
+        if self.debugger_address is not None:
+            # Attach to an already-running Chrome (started with
+            # --remote-debugging-port) instead of launching one per worker,
+            # so all workers share a single browser and only pay for a tab
+            options.add_experimental_option("debuggerAddress", self.debugger_address)
+            self.driver = webdriver.Chrome(service=service, options=options)
+            self.driver.switch_to.new_window("tab")
+            self.driver.set_window_size(1024, 1400)
+        else:
+            options.add_argument("--no-sandbox")
+            if self.headless:
+                # The "new" headless mode shares the regular browser's
+                # rendering path, so screenshots match headed output
+                options.add_argument("--headless=new")
+            if self.profile_dir is not None:
+                # A persistent profile keeps the authenticated session on
+                # disk across driver restarts; incognito would discard it
+                options.add_argument(f"--user-data-dir={self.profile_dir}")
+            else:
+                options.add_argument("--incognito")
+            options.add_argument("--disable-gpu")
+            options.add_argument("--disable-software-rasterizer")
+            options.add_argument("--window-size=1024,1400")
+            options.add_argument("--disable-dev-shm-usage")
+            # Background services that only add startup and per-page cost
+            # for a batch screenshot tool
+            options.add_argument(
+                "--disable-features=Translate,BackForwardCache,MediaRouter,"
+                "OptimizationHints"
+            )
+            options.add_argument("--disable-background-networking")
+            options.add_argument("--disable-sync")
+            options.add_argument("--disable-default-apps")
+            options.add_argument("--disable-extensions")
+            options.add_argument("--no-first-run")
+            options.add_argument("--disable-renderer-backgrounding")
+            options.add_argument("--metrics-recording-only")
+            options.add_argument("--mute-audio")
+            options.add_argument("--disable-crash-reporter")
+            options.add_argument("--disable-logging")
+            self.driver = webdriver.Chrome(service=service, options=options)
+        # Fail a stuck navigation after a minute instead of hanging the
+        # worker for chromedriver's unbounded default; the retry loop in
+        # process_dandiset_page turns that into a driver reset.  Async
+        # scripts get the same 300 s ceiling the long waits use.
+        # implicitly_wait stays at 0 - everything here uses explicit waits,
+        # and an implicit timeout would slow every negative find_elements.
+        self.driver.set_page_load_timeout(60)
+        self.driver.set_script_timeout(300)
+        # Shared wait objects with a uniform 50 ms poll: the 500 ms default
+        # oversleeps fast conditions, while 10 ms just burns CPU driving
+        # chromedriver round-trips
+        self.wait_long = WebDriverWait(self.driver, 300, poll_frequency=0.05)
+        self.wait_short = WebDriverWait(self.driver, 3, poll_frequency=0.05)
+        # Preinject the visibility helper into every document this driver
+        # will load
+        self.driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument",
+            {"source": self.VISIBLE_HELPER_SCRIPT},
+        )
+        # Drop screenshot-irrelevant traffic at the network layer
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+        self._blocked_urls = BLOCKED_URLS
         if self.do_login:
-            self.login(os.environ["DANDI_USERNAME"], os.environ["DANDI_PASSWORD"])
+            # A driver restarted mid-run (or a sibling worker) can reuse the
+            # session cookies of an earlier login instead of repeating the
+            # whole OAuth dance; a persistent profile makes even that
+            # unnecessary, as Chrome reads the session from disk itself
+            with self.login_lock():
+                if not self.profile_logged_in() and not self.load_cookies():
+                    self.login(
+                        os.environ["DANDI_USERNAME"],
+                        os.environ["DANDI_PASSWORD"],
+                    )
+                    self.save_cookies()
+                    if self.profile_dir is not None:
+                        (self.profile_dir / ".authenticated").touch()
         # warm up
         self.driver.get(self.gui_url)
 
+    @contextmanager
+    def login_lock(self):
+        """
+        Serialize the login check across workers.  On a cold start every
+        worker would otherwise run the OAuth dance for the same bot
+        account at once, which is exactly what trips GitHub's secondary
+        rate limit; under the lock the first worker logs in and the rest
+        then find its saved cookies.
+        """
+        if self.cookie_file is None:
+            yield
+            return
+        with self.cookie_file.with_suffix(".lock").open("w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def profile_logged_in(self) -> bool:
+        """
+        Check whether the persistent profile already holds an
+        authenticated session, i.e. an earlier incarnation of this worker
+        logged in and Chrome kept the cookies on disk.  The sentinel file
+        gates the navigation so a cold profile costs nothing.
+        """
+        if (
+            self.profile_dir is None
+            or not (self.profile_dir / ".authenticated").exists()
+        ):
+            return False
+        try:
+            self.driver.get(self.gui_url)
+            fast_wait(
+                self.driver,
+                EC.presence_of_element_located((By.CSS_SELECTOR, ".v-avatar")),
+                timeout=10,
+            )
+        except (TimeoutException, WebDriverException):
+            log.warning("Saved profile is no longer logged in")
+            return False
+        log.info("Reusing authenticated session from the saved profile")
+        return True
+
+    def load_cookies(self) -> bool:
+        """
+        Restore session cookies saved by an earlier login, if any, and
+        verify that they actually yield a logged-in session.  Returns True
+        on success.
+        """
+        if self.cookie_file is None or not self.cookie_file.exists():
+            return False
+        try:
+            with self.cookie_file.open() as f:
+                cookies = yaml.safe_load(f)
+            self.driver.get(self.gui_url)
+            for cookie in cookies:
+                self.driver.add_cookie(cookie)
+            self.driver.refresh()
+            fast_wait(
+                self.driver,
+                EC.presence_of_element_located((By.CSS_SELECTOR, ".v-avatar")),
+                timeout=10,
+            )
+        except (OSError, yaml.YAMLError, WebDriverException):
+            log.warning("Could not restore login session; logging in afresh")
+            return False
+        log.info("Restored login session from saved cookies")
+        return True
+
+    def save_cookies(self) -> None:
+        """Save the session cookies for reuse by later driver (re)starts"""
+        if self.cookie_file is None:
+            return
+        try:
+            with self.cookie_file.open("w") as f:
+                yaml.dump(self.driver.get_cookies(), f, Dumper=YamlDumper)
+        except (OSError, WebDriverException) as e:
+            log.warning("Could not save session cookies: %s", e)
+
     def login(self, username, password):
         log.info("Logging in ...")
         self.driver.get(self.gui_url)
         self.wait_no_progressbar("v-progress-circular")
-        login_button = WebDriverWait(self.driver, 300).until(
-            EC.presence_of_element_located((By.XPATH, "//button[@id='login']"))
+        login_button = self.wait_long.until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "button#login"))
         )
         login_text = login_button.text.strip().lower()
         assert "log in" in login_text.lower(), (
@@ -125,15 +416,17 @@ class Webshotter:
             f" got {login_text!r}"
         )
         login_button.click()
-        WebDriverWait(self.driver, 300).until(
-            EC.presence_of_element_located((By.ID, "login_field"))
-        )
-        username_field = self.driver.find_element(By.ID, "login_field")
-        password_field = self.driver.find_element(By.ID, "password")
-        username_field.send_keys(username)
-        password_field.send_keys(password)
+        self.wait_long.until(EC.presence_of_element_located((By.ID, "login_field")))
         # self.driver.save_screenshot("logging-in.png")
-        self.driver.find_elements(By.TAG_NAME, "form")[0].submit()
+        # Fill in and submit the form in a single round-trip rather than
+        # paying one per find_element/send_keys/submit command
+        self.driver.execute_script(
+            "document.getElementById('login_field').value = arguments[0];"
+            " document.getElementById('password').value = arguments[1];"
+            " document.forms[0].submit();",
+            username,
+            password,
+        )
 
         # Here we might get "Authorize" dialog or not
         # Solution based on https://stackoverflow.com/a/61895999/1265472
@@ -141,23 +434,22 @@ class Webshotter:
         for _ in range(2):
             try:
                 self.driver.find_element(
-                    By.XPATH,
-                    '//p[contains(text(), "secondary rate limit")]'
+                    By.XPATH, '//p[contains(text(), "secondary rate limit")]'
                 )
             except NoSuchElementException:
                 pass
             else:
                 raise RateLimitError("GitHub secondary rate limit exceeded")
-            el = WebDriverWait(self.driver, 300).until(
+            el = self.wait_long.until(
                 lambda driver: driver.find_elements(
-                    By.XPATH, '//button[@name="authorize"]'
+                    By.CSS_SELECTOR, "button[name=authorize]"
                 )
-                or self.driver.find_elements(By.CLASS_NAME, "v-avatar")
+                or self.driver.find_elements(By.CSS_SELECTOR, ".v-avatar")
             )[0]
             if el.tag_name == "button":
-                el = WebDriverWait(self.driver, 3).until(
+                el = self.wait_short.until(
                     EC.element_to_be_clickable(
-                        (By.XPATH, '//button[@name="authorize"]')
+                        (By.CSS_SELECTOR, "button[name=authorize]")
                     )
                 )
                 el.click()
@@ -170,6 +462,119 @@ class Webshotter:
         finally:
             self.set_driver()
 
+    # Registered via Page.addScriptToEvaluateOnNewDocument so every page
+    # this driver loads already carries the helper; polls can then ask one
+    # in-page question per round-trip instead of locating an element and
+    # querying its displayed state separately
+    # offsetParent would be simpler but reads null for position:fixed
+    # elements even when fully visible, and Vuetify likes fixed overlays;
+    # checkVisibility matches what is actually rendered
+    VISIBLE_HELPER_SCRIPT = """
+        window.__webshotsVisible = function (cls) {
+            var els = document.getElementsByClassName(cls);
+            for (var i = 0; i < els.length; i++) {
+                var el = els[i];
+                if (el.checkVisibility ? el.checkVisibility()
+                    : getComputedStyle(el).display !== 'none'
+                      && getComputedStyle(el).visibility !== 'hidden')
+                    return true;
+            }
+            return false;
+        };
+    """
+
+    # Resolves as soon as no visible element of the given class remains,
+    # driven by a MutationObserver inside the page, so the whole wait is a
+    # single webdriver call instead of a poll round-trip every 100 ms
+    WAIT_GONE_SCRIPT = """
+        var cls = arguments[0];
+        var done = arguments[arguments.length - 1];
+        function visible(el) {
+            return el.checkVisibility ? el.checkVisibility()
+                : getComputedStyle(el).display !== 'none'
+                  && getComputedStyle(el).visibility !== 'hidden';
+        }
+        function gone() {
+            var els = document.getElementsByClassName(cls);
+            for (var i = 0; i < els.length; i++) {
+                if (visible(els[i]))
+                    return false;
+            }
+            return true;
+        }
+        if (gone()) {
+            done(true);
+            return;
+        }
+        var obs = new MutationObserver(function () {
+            if (gone()) {
+                obs.disconnect();
+                done(true);
+            }
+        });
+        obs.observe(document.documentElement,
+                    {subtree: true, childList: true, attributes: true});
+    """
+
+    # Resolves once the page has settled: the document is fully loaded, no
+    # CSS/Web animations are running, and the DOM has gone a given number
+    # of milliseconds without mutating.  A MutationObserver alone is not
+    # enough here, as a pure-CSS transition animates without touching the
+    # DOM.
+    ANIMATIONS_IDLE_SCRIPT = """
+        var quiet = arguments[0];
+        var done = arguments[arguments.length - 1];
+        var last = performance.now();
+        new MutationObserver(function () {
+            last = performance.now();
+        }).observe(document.documentElement,
+                   {subtree: true, childList: true, attributes: true});
+        function settled() {
+            return performance.now() - last > quiet
+                && document.readyState === 'complete'
+                && document.getAnimations().every(
+                    function (a) { return a.playState !== 'running'; });
+        }
+        function tick() {
+            if (settled())
+                done(true);
+            else
+                requestAnimationFrame(tick);
+        }
+        requestAnimationFrame(tick);
+    """
+
+    def wait_animations_idle(self, quiet: float = 0.3, timeout: float = 2.0) -> None:
+        """
+        Wait until the page has finished loading, all animations are idle,
+        and the DOM has stopped mutating for `quiet` seconds, capped at
+        `timeout` seconds total.  Used before screenshots in place of a
+        fixed sleep to overcome
+        https://github.com/dandi/dandiarchive/issues/650 - animations etc.
+        """
+        self.driver.set_script_timeout(timeout)
+        try:
+            self.driver.execute_async_script(
+                self.ANIMATIONS_IDLE_SCRIPT, int(quiet * 1000)
+            )
+        except (TimeoutException, WebDriverException):
+            # The page never settled (or the probe could not run);
+            # screenshot it as-is, just as the fixed sleep used to
+            pass
+        finally:
+            self.driver.set_script_timeout(300)
+
+    def set_block_images(self, block_images: bool) -> None:
+        """
+        Switch the driver between the baseline blocklist and the one that
+        also drops raster images.  A no-op when already in the requested
+        state, so calling it per page costs nothing in the common case.
+        """
+        urls = IMAGE_BLOCKED_URLS if block_images else BLOCKED_URLS
+        if urls is not self._blocked_urls:
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+            self._blocked_urls = urls
+
     def wait_no_progressbar(self, cls, wait_appear=0):
         if wait_appear:
             # this is a dirty solution to the fact that now progress bar might not
@@ -177,8 +582,14 @@ class Webshotter:
             try:
                 log.debug("Wait for progress bar %s to appear", cls)
                 t0 = time.time()
-                WebDriverWait(self.driver, wait_appear, poll_frequency=0.05).until(
-                    EC.visibility_of_element_located((By.CLASS_NAME, cls))
+                fast_wait(
+                    self.driver,
+                    lambda d: d.execute_script(
+                        "return window.__webshotsVisible"
+                        " && window.__webshotsVisible(arguments[0]);",
+                        cls,
+                    ),
+                    timeout=wait_appear,
                 )
                 log.debug(" %s appeared after %fs", cls, time.time() - t0)
             except TimeoutException:
@@ -187,9 +598,32 @@ class Webshotter:
                 )
                 return False  # no need to wait -- it did not come
         log.debug("Wait for progress bar %s to dis-appear", cls)
-        WebDriverWait(self.driver, 300, poll_frequency=0.1).until(
-            EC.invisibility_of_element_located((By.CLASS_NAME, cls))
-        )
+        # One-shot probe first: on fast/cached loads the bar is often
+        # already gone (or never rendered at all), and a plain sync call is
+        # cheaper than arming the observer-based wait.  The ternary keeps
+        # a missing helper (injected per-document) from reading as "gone".
+        try:
+            if self.driver.execute_script(
+                "return window.__webshotsVisible"
+                " ? !window.__webshotsVisible(arguments[0]) : false;",
+                cls,
+            ):
+                return True
+        except WebDriverException:
+            pass
+        try:
+            self.driver.execute_async_script(self.WAIT_GONE_SCRIPT, cls)
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            # e.g. a navigation destroyed the script context mid-wait;
+            # fall back to polling over the wire
+            # A bare find_elements emptiness check is one round-trip per
+            # poll; EC.invisibility would fetch the element and then also
+            # query its displayed-ness
+            self.wait_long.until(
+                lambda d: not d.find_elements(By.CSS_SELECTOR, "." + cls)
+            )
         return True
 
     def fetch_logs(self, filename=None):
@@ -213,19 +647,62 @@ class Webshotter:
             fileobj.unlink(missing_ok=True)
             if logs:
                 with fileobj.open("w") as f:
-                    yaml.safe_dump(logs, f)
+                    yaml.dump(logs, f, Dumper=YamlDumper)
         return logs
 
-    def process_dandiset_page(self, ds, urlsuf, page, wait_cls, pbar_cls, act):
+    def fetch_page_source(self, filename):
+        """
+        Save the current page's HTML source, zstd-compressed, under
+        `filename` with an .html.zst suffix
+
+        Does nothing unless FETCH_PAGE_SOURCE is enabled.  The file is
+        removed first regardless, so a stale dump is never left behind.
+        """
+        if not FETCH_PAGE_SOURCE:
+            return
+        fileobj = Path(filename).with_suffix(".html.zst")
+        # CDP serializes the tree natively; driver.page_source pushes the
+        # same HTML through the slower WebDriver command path
+        root = self.driver.execute_cdp_cmd("DOM.getDocument", {"depth": 0})
+        source = self.driver.execute_cdp_cmd(
+            "DOM.getOuterHTML", {"nodeId": root["root"]["nodeId"]}
+        )["outerHTML"]
+        self.io_futures.append(
+            self.io_pool.submit(self._dump_page_source, fileobj, source)
+        )
+
+    @staticmethod
+    def _dump_page_source(fileobj: Path, source: str) -> None:
+        # A compressor per dump, as zstd contexts cannot be shared between
+        # concurrent operations; creating one is cheap next to compressing
+        # multi-MB HTML
+        fileobj.unlink(missing_ok=True)
+        fileobj.write_bytes(
+            zstandard.ZstdCompressor(level=10).compress(source.encode("utf-8"))
+        )
+
+    def drain_io(self) -> None:
+        """
+        Block until all queued background writes have finished, surfacing
+        any exception they raised.
+        """
+        futures, self.io_futures = self.io_futures, []
+        for fut in futures:
+            fut.result()
+
+    def process_dandiset_page(
+        self, ds, urlsuf, page, wait_cls, pbar_cls, act, block_images=False
+    ):
         # TODO: do not do draft unless there is one
         # TODO: do for a released version
         log.info("%s %s", ds, page)
+        self.pages_since_login += 1
         page_name = Path("images", ds, page)
         # So we could try a few times in case of catching WebDriverException
         # e.g. as in the case of "invalid session id" whenever we would
         # reinitialize the entire driver
         for _ in range(3):
-            page_name.with_suffix(".png").unlink(missing_ok=True)
+            page_name.with_suffix(self.screenshot_suffix).unlink(missing_ok=True)
             t0 = time.monotonic()
             # ad-hoc workaround for https://github.com/dandi/dandiarchive/issues/662
             # with hope it is the only one and to not overcomplicate things so
@@ -234,14 +711,13 @@ class Webshotter:
             #    t = "timeout/crash"
             #    break
             try:
-                if urlsuf is not None:
-                    log.debug("Before get")
-                    self.driver.get(f"{self.gui_url}/dandiset/{ds}{urlsuf}")
-                    log.debug("After get")
-                else:
-                    log.debug("Before get")
-                    self.driver.get(f"{self.gui_url}/dandiset/{ds}")
-                    log.debug("After get")
+                # Inside the retry loop: a driver reset reverts the
+                # blocklist to the baseline
+                self.set_block_images(block_images)
+                log.debug("Before get")
+                self.driver.get(self._ds_url_prefix + ds + (urlsuf or ""))
+                log.debug("After get")
+                if urlsuf is None:
                     log.debug("Before initial wait")
                     self.wait_no_progressbar("v-progress-circular")
                     log.debug("After initial wait")
@@ -251,9 +727,7 @@ class Webshotter:
                     log.debug("After act")
                 if wait_cls is not None:
                     log.debug("Wait for %s to appear", wait_cls)
-                    WebDriverWait(self.driver, 300, poll_frequency=0.01).until(
-                        EC.visibility_of_element_located((By.CLASS_NAME, wait_cls))
-                    )
+                    self.wait_long.until(WAIT_VISIBLE_CONDS[wait_cls])
                 if pbar_cls is not None:
                     log.debug("Before wait")
                     # TEMP: we will have 3 seconds timeout for empty dandisets.
@@ -265,29 +739,23 @@ class Webshotter:
             except TimeoutException:
                 log.debug("Timed out")
                 return "timeout"
-            except WebDriverException:  # as exc:
-                # do not bother trying to resurrect - it seems to not working
-                # really based on 000040 timeout experience
-                raise
-                """
+            except WebDriverException as exc:
                 t = str(exc).rstrip()  # so even if we continue out of the loop
                 log.warning("Caught %s. Reinitializing", str(exc))
-                # it might be a reason for subsequent "Max retries exceeded"
-                # since it closes "too much"
                 self.reset_driver()
                 continue
-                """
             except Exception as exc:
                 log.warning("Caught unexpected %s.", str(exc))
                 return str(exc).rstrip()
             else:
                 t = time.monotonic() - t0
-                # to overcome https://github.com/dandi/dandiarchive/issues/650
-                # - animations etc:
-                time.sleep(2)
-                self.driver.save_screenshot(str(page_name.with_suffix(".png")))
+                self.wait_animations_idle()
+                self.save_screenshot(page_name.with_suffix(self.screenshot_suffix))
+                self.fetch_page_source(page_name)
                 self.fetch_logs(page_name)
                 return t
+        # All attempts hit WebDriverException; report the last error
+        return t
 
 
 @dataclass
@@ -366,33 +834,105 @@ class RateLimitError(Exception):
     pass
 
 
+# How long a cached dandiset listing stays good for, in seconds
+DANDISETS_CACHE_TTL = 3600
+
+
 def get_dandisets(dandi_instance):
-    """Return a list of known Dandiset IDs"""
+    """
+    Return a list of (ID, has_draft) pairs for known Dandisets
+
+    The listing is cached on disk for an hour per instance: dandiset IDs
+    and draft status change rarely relative to how often this tool runs,
+    and a warm run then costs no API round-trips at all.
+    """
+    cache = Path(
+        os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"),
+        "dandi-webshots",
+        f"dandisets-{dandi_instance}.json",
+    )
+    try:
+        if time.time() - cache.stat().st_mtime < DANDISETS_CACHE_TTL:
+            with cache.open() as f:
+                return [(ds, has_draft) for ds, has_draft in json.load(f)]
+    except (OSError, ValueError):
+        pass
+    # Materialize the whole listing up front and close the client before
+    # returning: a generator would keep the HTTP session (and its iterator)
+    # dangling across the hours-long Selenium phase, risking a mid-run API
+    # timeout aborting the enumeration
+    dandisets = []
     with DandiAPIClient.for_dandi_instance(dandi_instance) as client:
+        # Since dandi 0.40.0 the client fetches the listing pages
+        # concurrently (5 at a time) under the hood, so enumerating all
+        # dandisets costs roughly one page round-trip rather than one per
+        # page; hence the version pin in requirements.txt
         for d in sorted(client.get_dandisets(), key=attrgetter("identifier")):
-            yield d.identifier
+            # The listing already carries the version info, so this does not
+            # cost an extra request per dandiset
+            try:
+                has_draft = d.draft_version is not None
+            except NotFoundError:
+                has_draft = False
+            dandisets.append((d.identifier, has_draft))
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        cache.write_text(json.dumps(dandisets))
+    except OSError as e:
+        log.warning("Could not cache the dandiset listing: %s", e)
+    return dandisets
+
+
+# EC condition objects are stateless callables, so the per-page ones can be
+# built once at import instead of once per dandiset
+EDIT_CLICKABLE_COND = EC.element_to_be_clickable(
+    (By.CSS_SELECTOR, "button#view-edit-metadata")
+)
 
 
 def click_edit(driver):
     # might still take a bit to appear
     # TODO: more sensible way to "identify" it:
     # https://github.com/dandi/dandiarchive/issues/648
-    edit_button = WebDriverWait(driver, 3).until(
-        EC.element_to_be_clickable((By.XPATH, '//button[@id="view-edit-metadata"]'))
-    )
+    edit_button = fast_wait(driver, EDIT_CLICKABLE_COND, timeout=3)
     edit_button.click()
 
 
-PAGES = {
-    "landing": ("", "mdi-folder", None, None),
-    "edit-metadata": (None, "mdi-folder", None, click_edit),
+# README link labels per page; anything not listed is a plain "Go to page"
+PAGE_LABELS = {"edit-metadata": "Edit Metadata"}
+
+# (page, urlsuf, wait_cls, pbar_cls, act, block_images), iterated in order
+PAGES = (
+    ("landing", "", "mdi-folder", None, None, False),
+    # The metadata form renders no raster images worth keeping
+    ("edit-metadata", None, "mdi-folder", None, click_edit, True),
     # TODO: remove ?location= after https://github.com/dandi/dandi-archive/issues/1058
     # is fixed
-    "view-data": ("/draft/files?location=", None, "v-progress-linear", None),
+    # The file listing is icon fonts and text; any raster images there are
+    # decoration we can live without in a thumbnail
+    ("view-data", "/draft/files?location=", None, "v-progress-linear", None, True),
+)
+
+WAIT_VISIBLE_CONDS = {
+    wait_cls: EC.visibility_of_element_located((By.CSS_SELECTOR, "." + wait_cls))
+    for _, _, wait_cls, *_ in PAGES
+    if wait_cls is not None
 }
 
 
-def snapshot_pipe(dandi_instance, gui_url, log_level, headless, login, c1, conn):
+def snapshot_pipe(
+    dandi_instance,
+    gui_url,
+    log_level,
+    headless,
+    login,
+    debugger_address,
+    screenshot_format,
+    cookie_file,
+    profile_dir,
+    c1,
+    conn,
+):
     cfg_log(log_level)
     # <https://stackoverflow.com/a/6567318/744178>
     c1.close()
@@ -401,29 +941,51 @@ def snapshot_pipe(dandi_instance, gui_url, log_level, headless, login, c1, conn)
     if gui_url is None:
         gui_url = known_instances[dandi_instance].gui
     try:
-        with Webshotter(gui_url, headless, login) as ws:
+        with Webshotter(
+            gui_url,
+            headless,
+            login,
+            debugger_address,
+            screenshot_format,
+            cookie_file,
+            profile_dir,
+        ) as ws:
             while True:
                 try:
-                    ds, page = conn.recv()
+                    ds, pages = conn.recv()
                 except EOFError:
                     break
-                urlsuf, wait_cls, pbar_cls, act = PAGES[page]
-                # Try to avoid hitting GitHub's secondary rate limit:
-                time.sleep(2)
-                t = ws.process_dandiset_page(ds, urlsuf, page, wait_cls, pbar_cls, act)
-                conn.send(
-                    LoadStat(
-                        dandiset=ds,
-                        page=page,
-                        time=t,
-                        label="Edit Metadata"
-                        if page == "edit-metadata"
-                        else "Go to page",
-                        url=f"{gui_url}/dandiset/{ds}{urlsuf}"
-                        if urlsuf is not None
-                        else None,
+                # Process all requested pages of a dandiset in one go so that
+                # the session, cookies, and caches stay warm between them
+                stats = []
+                ds_url = f"{gui_url}/dandiset/{ds}"
+                ext = ws.screenshot_suffix[1:]
+                for page, urlsuf, wait_cls, pbar_cls, act, block_images in PAGES:
+                    if page not in pages:
+                        continue
+                    # Try to avoid hitting GitHub's secondary rate limit
+                    # right after the OAuth dance; later pages never touch
+                    # GitHub, so they need no throttling
+                    if ws.pages_since_login < 3:
+                        time.sleep(2)
+                    t = ws.process_dandiset_page(
+                        ds, urlsuf, page, wait_cls, pbar_cls, act, block_images
                     )
-                )
+                    stats.append(
+                        LoadStat(
+                            dandiset=ds,
+                            page=page,
+                            time=t,
+                            label=PAGE_LABELS.get(page, "Go to page"),
+                            url=ds_url + urlsuf if urlsuf is not None else None,
+                            ext=ext,
+                        )
+                    )
+                # Join the background writes before reporting the dandiset
+                # done, so the parent never sees stats for files still in
+                # flight
+                ws.drain_io()
+                conn.send(stats)
     except RateLimitError as e:
         conn.send(Fatality(str(e)))
         raise
@@ -456,37 +1018,172 @@ def snapshot_pipe(dandi_instance, gui_url, log_level, headless, login, c1, conn)
 @click.option(
     "--login/--no-login", default=True, help="Login or not login to DANDI archive"
 )
+@click.option(
+    "-f",
+    "--image-format",
+    type=click.Choice(["png", "jpeg", "webp"]),
+    default="jpeg",
+    show_default=True,
+    help=(
+        "Screenshot encoding: lossless png (largest, slowest to encode),"
+        " or lossy jpeg/webp at quality 80"
+    ),
+)
+@click.option(
+    "--debugger-address",
+    metavar="HOST:PORT",
+    help=(
+        "Attach all workers to an already-running Chrome exposing this"
+        " DevTools endpoint (started with --remote-debugging-port) instead"
+        " of launching one browser per worker"
+    ),
+)
+@click.option(
+    "-J",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=min(os.cpu_count() or 1, 4),
+    show_default=True,
+    help="Number of concurrent browser workers",
+)
 @click.argument("dandisets", nargs=-1)
-def main(dandi_instance, gui_url, dandisets, log_level, headless, login):
+def main(
+    dandi_instance,
+    gui_url,
+    dandisets,
+    log_level,
+    headless,
+    login,
+    jobs,
+    debugger_address,
+    image_format,
+):
     cfg_log(log_level)
     if dandisets:
         doreadme = False
+        pages_for_ds = {ds: tuple(p for p, *_ in PAGES) for ds in dandisets}
     else:
-        dandisets = get_dandisets(dandi_instance)
         doreadme = True
+        # No point in loading the draft files listing of a dandiset that has
+        # no draft
+        pages_for_ds = {
+            ds: tuple(p for p, *_ in PAGES if p != "view-data" or has_draft)
+            for ds, has_draft in get_dandisets(dandi_instance)
+        }
+        dandisets = list(pages_for_ds)
 
     # with Webshotter(dandi_instance) as ws:
     #     ws.fetch_logs("initial_log")
 
-    allstats = []
-    readme = ""
-    with FlakeyFeeder(
-        snapshot_pipe, (dandi_instance, gui_url, log_level, headless, login)
-    ) as ff:
+    stats_by_ds = {}
+    with ExitStack() as stack:
+        # Holds the cookies saved after the first successful login, so that
+        # restarted workers come up already authenticated; lives only for
+        # this run
+        tmpdir = Path(
+            stack.enter_context(tempfile.TemporaryDirectory(prefix="webshots-"))
+        )
+        cookie_file = tmpdir / "cookies.yaml"
+        # The worker profiles, by contrast, survive the run: a warm CI
+        # re-run then skips the whole login dance, not just the per-restart
+        # part.  Keyed by instance since the login session differs; assumes
+        # runs do not overlap, as concurrent Chromes cannot share a profile.
+        profile_base = Path(
+            os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"),
+            "dandi-webshots",
+            f"profiles-{dandi_instance}",
+        )
+        profile_base.mkdir(parents=True, exist_ok=True)
+        # Each FlakeyFeeder (and thus each Chrome) is checked out by at most
+        # one thread at a time, as the feeders are not thread-safe.
+        feeders = Queue()
+        for i in range(jobs):
+            feeders.put(
+                stack.enter_context(
+                    FlakeyFeeder(
+                        snapshot_pipe,
+                        (
+                            dandi_instance,
+                            gui_url,
+                            log_level,
+                            headless,
+                            login,
+                            debugger_address,
+                            image_format,
+                            cookie_file,
+                            # One profile per feeder; restarts of the same
+                            # feeder (and later runs) reuse it
+                            profile_base / f"profile{i}",
+                        ),
+                    )
+                )
+            )
+
+        def snapshot(ds, pages, attempt):
+            ff = feeders.get()
+            try:
+                if attempt > 1:
+                    # Exponential backoff before retrying failed pages
+                    time.sleep(2**attempt)
+                return ff(ds, pages)
+            finally:
+                feeders.put(ff)
+
         for ds in dandisets:
             Path("images", ds).mkdir(parents=True, exist_ok=True)
-            stats = []
-            for page in PAGES:
-                stats.append(ff(ds, page))
-            times = {st.page: st.time for st in stats}
-            with Path("images", ds, "info.yaml").open("w") as f:
-                yaml.safe_dump({"times": times}, f)
-            readme += render_stats(ds, stats)
-            allstats.extend(stats)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            pending = {
+                executor.submit(snapshot, ds, pages_for_ds[ds], 1): (ds, 1)
+                for ds in dandisets
+            }
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        ds, attempt = pending.pop(fut)
+                        for st in fut.result():
+                            stats_by_ds.setdefault(ds, {})[st.page] = st
+                        # Transient failures (net blips, timeouts) get
+                        # another go without restarting the whole run
+                        failed = tuple(
+                            page
+                            for page, st in stats_by_ds[ds].items()
+                            if not st.has_time()
+                        )
+                        if failed and attempt < MAX_PAGE_TRIES:
+                            log.warning(
+                                "%s: pages %s failed on attempt %d; retrying",
+                                ds,
+                                ", ".join(failed),
+                                attempt,
+                            )
+                            pending[
+                                executor.submit(snapshot, ds, failed, attempt + 1)
+                            ] = (ds, attempt + 1)
+            except BaseException:
+                # A fatal error (e.g. a worker's RateLimitError) or Ctrl-C
+                # must abort the run now; the executor's own __exit__ would
+                # first drain every queued dandiset
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    allstats = []
+    readme_parts = []
+    for ds in dandisets:
+        stats = [stats_by_ds[ds][page] for page in pages_for_ds[ds]]
+        times = {st.page: st.time for st in stats}
+        # Serialize in memory and write the bytes in one go
+        Path("images", ds, "info.yaml").write_bytes(
+            yaml.dump({"times": times}, Dumper=YamlDumper, encoding="utf-8")
+        )
+        readme_parts.append(render_stats(ds, stats))
+        allstats.extend(stats)
 
     if doreadme:
-        stat_tbl = "| Page | Min Time | Mean ± StdDev | Max Time | Errors |\n"
-        stat_tbl += "| --- | --- | --- | --- | --- |\n"
+        tbl_parts = [
+            "| Page | Min Time | Mean ± StdDev | Max Time | Errors |\n",
+            "| --- | --- | --- | --- | --- |\n",
+        ]
         page_stats = defaultdict(list)
         errors = defaultdict(list)
         for st in allstats:
@@ -494,18 +1191,25 @@ def main(dandi_instance, gui_url, dandisets, log_level, headless, login):
                 page_stats[st.page].append(st)
             else:
                 errors[st.page].append(st.dandiset)
-        for page in PAGES.keys():
+        for page, *_ in PAGES:
             stats = page_stats[page]
             if stats:
-                minstat = min(stats, key=attrgetter("time"))
+                # Fused min/max/mean/pstdev in a single pass over the stats
+                minstat = maxstat = stats[0]
+                total = sumsq = 0.0
+                for st in stats:
+                    if st.time < minstat.time:
+                        minstat = st
+                    if st.time > maxstat.time:
+                        maxstat = st
+                    total += st.time
+                    sumsq += st.time * st.time
+                mean = total / len(stats)
+                stddev = sqrt(max(sumsq / len(stats) - mean * mean, 0.0))
                 min_cell = (
                     f"{minstat.time:.2f}s ([{minstat.dandiset}](#{minstat.dandiset}))"
                 )
-                times = [st.time for st in stats]
-                mean = statistics.mean(times)
-                stddev = statistics.pstdev(times, mu=mean)
                 mean_stddev = f"{mean:.2f}s ± {stddev:.2f}s"
-                maxstat = max(stats, key=attrgetter("time"))
                 max_cell = (
                     f"{maxstat.time:.2f}s ([{maxstat.dandiset}](#{maxstat.dandiset}))"
                 )
@@ -515,11 +1219,12 @@ def main(dandi_instance, gui_url, dandisets, log_level, headless, login):
                 errs = ", ".join(f"[{ds}](#{ds})" for ds in errors[page])
             else:
                 errs = "\u2014"
-            stat_tbl += (
+            tbl_parts.append(
                 f"| {page} | {min_cell} | {mean_stddev} | {max_cell} | {errs} |\n"
             )
-        readme = stat_tbl + "\n\n" + readme
-        Path("README.md").write_text(readme)
+        tbl_parts.append("\n\n")
+        tbl_parts.extend(readme_parts)
+        Path("README.md").write_bytes("".join(tbl_parts).encode("utf-8"))
 
 
 def cfg_log(log_level: int) -> None:
@@ -538,12 +1243,33 @@ def cleanup_children() -> None:
     if not procs:
         return
     log.info("Cleaning up %d child processes", len(procs))
+    # One signal per process group takes down a whole Chrome tree at once;
+    # children still in our own group get signalled individually
+    own_pgid = os.getpgid(0)
+    pgids = set()
+    stragglers = []
     for p in procs:
+        try:
+            pgid = os.getpgid(p.pid)
+        except (ProcessLookupError, PermissionError):
+            continue
+        if pgid != own_pgid:
+            pgids.add(pgid)
+        else:
+            stragglers.append(p)
+    for pgid in pgids:
+        try:
+            os.killpg(pgid, SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+    for p in stragglers:
         try:
             p.terminate()
         except NoSuchProcess:
             pass
-    gone, alive = wait_procs(procs, timeout=3)
+    # Throwaway browser helpers do not need a long grace period before
+    # SIGKILL
+    gone, alive = wait_procs(procs, timeout=1)
     for p in alive:
         try:
             p.kill()
@@ -22,7 +22,7 @@ venv/bin/pip install -r tools/requirements.txt
 . venv/bin/activate
 
 set +x
-GITHUB_TOKEN="$(git config hub.oauthtoken)"
+export GITHUB_TOKEN="$(git config hub.oauthtoken)"
 . ~/secrets.env
 export DANDI_USERNAME=dandibot
 export DANDI_PASSWORD="$DANDIBOT_GITHUB_PASSWORD"
@@ -45,18 +45,9 @@ do
         else state=failure
         fi
 
-        jq -n \
-            --arg state "$state" \
-            --arg target_url "https://github.com/$WEBSHOTS_REPO/tree/pr-$pr" \
-            '{
-                "state": $state,
-                "context": "Webshots",
-                "target_url": $target_url
-            }' \
-        | curl -fsSL -X POST -d @- \
-            -H "Authorization: bearer $GITHUB_TOKEN" \
-            -H "Content-Type: application/json" \
-            "https://api.github.com/repos/$CODE_REPO/statuses/$pr_head"
+        python tools/set-pr-status.py --sha "$pr_head" \
+            --target-url "https://github.com/$WEBSHOTS_REPO/tree/pr-$pr" \
+            "$CODE_REPO" "$pr" "$state"
 
         git add .
         if ! git diff --quiet --cached
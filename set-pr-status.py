@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import configparser
+import os
+from pathlib import Path
+import subprocess
+
+import click
+import requests
+
+
+def get_github_token() -> str:
+    token = os.environ.get("GITHUB_TOKEN")
+    if token:
+        return token
+    # Read the config files directly before forking git: a plain
+    # hub.oauthtoken entry does not need fork+exec just to be looked up.
+    # strict=False tolerates the duplicate sections git allows.
+    cp = configparser.ConfigParser(strict=False, interpolation=None)
+    try:
+        cp.read(
+            [
+                Path.home() / ".gitconfig",
+                Path(
+                    os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"),
+                    "git",
+                    "config",
+                ),
+            ]
+        )
+        token = cp.get("hub", "oauthtoken", fallback=None)
+    except configparser.Error:
+        token = None
+    if token:
+        return token
+    # git config also handles includes, worktree/system scopes, etc.
+    return subprocess.run(
+        ["git", "config", "hub.oauthtoken"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+@click.command()
+@click.option("--context", default="Webshots", show_default=True, help="Status context")
+@click.option("--target-url", help="URL to link the status to")
+@click.option(
+    "--sha",
+    help="Commit to set the status on  [default: the PR's current head]",
+)
+@click.argument("repo")
+@click.argument("pr", type=int)
+@click.argument("state", type=click.Choice(["error", "failure", "pending", "success"]))
+def main(repo, pr, state, context, target_url, sha):
+    """
+    Set a commit status on the head of REPO's pull request PR.
+
+    Replaces the curl/jq pipeline in run-webshots-pr.sh: both GitHub
+    calls run in one process over a single kept-alive connection.
+    """
+    with requests.Session() as s:
+        s.headers["Authorization"] = f"bearer {get_github_token()}"
+        s.headers["Accept"] = "application/vnd.github+json"
+        if sha is None:
+            r = s.get(f"https://api.github.com/repos/{repo}/pulls/{pr}")
+            r.raise_for_status()
+            statuses_url = r.json()["statuses_url"]
+        else:
+            statuses_url = f"https://api.github.com/repos/{repo}/statuses/{sha}"
+        status = {"state": state, "context": context}
+        if target_url is not None:
+            status["target_url"] = target_url
+        # POST on the session, not with a fresh connection, so the pooled
+        # TLS connection from the GET gets reused
+        s.post(statuses_url, json=status).raise_for_status()
+
+
+if __name__ == "__main__":
+    main()